@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""Forwards magik commands to a resident magik server (see magik.server), if
+one is running. This module is imported on every invocation of magik, so it
+must only import modules that are already loaded when python starts, or load
+quickly. This is why the low level _socket module is used instead of socket
+(which imports enum and selectors), and why messages use a simple framing
+instead of JSON.
+
+Request: the client's working directory and the arguments, separated by NUL
+bytes. The client then shuts down its side of the connection for writing.
+
+Reply: either "-\n" if the client has to run the command itself, or
+"<status> <length of stdout in bytes>\n" followed by the command's stdout and
+then its stderr, until the connection is closed."""
+
+import os
+import sys
+import _socket
+
+# Commands that the resident server can run. Other commands always run in
+# the calling process.
+forwarded_commands = {"watch", "open"}
+
+no_server_flag = "--no-server"
+
+not_handled_reply = b"-\n"
+
+
+def get_socket_path() -> str:
+    """Return the path of the socket used by the resident server of the
+    current user. Can be overridden using the MAGIK_SOCKET environment
+    variable."""
+    if "MAGIK_SOCKET" in os.environ:
+        return os.environ["MAGIK_SOCKET"]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "magik.sock")
+    return os.path.join(get_private_socket_dir(), "magik.sock")
+
+
+def get_private_socket_dir() -> str:
+    """Directory of the socket when XDG_RUNTIME_DIR isn't set. The server
+    creates it with mode 0700 (see magik.server.create_server)."""
+    return os.path.join(os.environ.get("TMPDIR", "/tmp"), f"magik-{os.getuid()}")
+
+
+def encode_request(cwd: str, argv) -> bytes:
+    return "\0".join([cwd, *argv]).encode()
+
+
+def decode_request(request: bytes):
+    """Return the (cwd, argv) sent by a client."""
+    cwd, *argv = request.decode().split("\0")
+    return cwd, argv
+
+
+def encode_reply(status: int, stdout: str, stderr: str) -> bytes:
+    stdout, stderr = stdout.encode(), stderr.encode()
+    return f"{status} {len(stdout)}\n".encode() + stdout + stderr
+
+
+def receive_all(sock) -> bytes:
+    """Read from the socket until the other side stops sending."""
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def is_owned_by_current_user(socket_path: str) -> bool:
+    """Return True if the socket exists and belongs to the current user, so
+    that commands and the working directory are never sent to a server
+    started by another user."""
+    try:
+        return os.stat(socket_path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+
+def forward_command(argv, socket_path: str = None, timeout: float = 30):
+    """Run the command in the resident server. Returns the exit status of the
+    command, or None if the command has to be run in this process instead
+    (no server is running, or the server doesn't run this command)."""
+    if no_server_flag in argv or not forwarded_commands.intersection(argv):
+        return None
+    socket_path = socket_path or get_socket_path()
+    if not is_owned_by_current_user(socket_path):
+        return None
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return None
+        try:
+            sock.sendall(encode_request(os.getcwd(), argv))
+            sock.shutdown(_socket.SHUT_WR)
+            reply = receive_all(sock)
+        except OSError as e:
+            print(f"magik server didn't respond: {e}", file=sys.stderr)
+            return 1
+    finally:
+        sock.close()
+    header, _, output = reply.partition(b"\n")
+    if not header or header + b"\n" == not_handled_reply:
+        return None
+    status, stdout_length = map(int, header.split())
+    sys.stdout.buffer.write(output[:stdout_length])
+    sys.stdout.flush()
+    sys.stderr.buffer.write(output[stdout_length:])
+    sys.stderr.flush()
+    return status
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+"""Exports timetables of one or many profiles as columns, for analytics.
+Timetables are read straight from timetable csv files or a profile store,
+without building Slot objects, and written as a NumPy structured array
+(.npy), an uncompressed Arrow IPC file (.arrow, also known as Feather v2)
+or a Parquet file (.parquet). .npy and Arrow files are memory-mapped when
+loaded, so large exports can be processed without copying them into
+memory. Parquet files are compressed, and are decoded into memory.
+
+Requires numpy, and pyarrow for Arrow and Parquet files."""
+
+import array
+import csv
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+from magik.defaults import default_timetable_file_path
+from magik.structs import Time
+from magik.utils import get_day_boundary_times, get_slot_end_times, get_time_from_timestring
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Suffixes of Arrow IPC files
+arrow_suffixes = ('.arrow', '.feather')
+
+weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Codes used in the 'slot_type' column
+slot_type_codes = {"empty": 0, "break": 1, "class": 2, "zero": 3, "eod": 4}
+
+
+class TimetableColumns:
+    """Collects slots column by column. The numeric columns are kept in
+    compact arrays rather than lists of Python objects."""
+    def __init__(self) -> None:
+        self.profile = []
+        self.weekday = array.array('b')
+        self.start_seconds = array.array('i')
+        self.end_seconds = array.array('i')
+        self.slot_type = array.array('B')
+        self.category = []
+
+    def __len__(self) -> int:
+        return len(self.start_seconds)
+
+    def append(self, profile: str, weekday: int, start_seconds: int, end_seconds: int, slot_type: int, category: str) -> None:
+        self.profile.append(profile)
+        self.weekday.append(weekday)
+        self.start_seconds.append(start_seconds)
+        self.end_seconds.append(end_seconds)
+        self.slot_type.append(slot_type)
+        self.category.append(category)
+
+    def add_day(self, profile: str, day: str, start_seconds: List[int], end_seconds: List[int], slot_strings: Iterable[str]) -> None:
+        """Add the slots of a day. Zero and end of day slots are added in the
+        same way as in Profile.get_dayschedule_from_dict."""
+        if not start_seconds:
+            return
+        try:
+            weekday = weekdays.index(day)
+        except ValueError:
+            raise ValueError(f"Invalid day in timetable of {profile}: {day}")
+        zero_slot_times, eod_slot_times = get_day_boundary_times(Time(0,0,0) + start_seconds[0],
+                                                                 Time(0,0,0) + end_seconds[-1])
+        if zero_slot_times:
+            self.append(profile, weekday, *(time.to_seconds() for time in zero_slot_times), slot_type_codes["zero"], '')
+        for start, end, slot_string in zip(start_seconds, end_seconds, slot_strings):
+            slot_string = slot_string or ''
+            if slot_string == '':
+                self.append(profile, weekday, start, end, slot_type_codes["empty"], '')
+            elif slot_string == 'break':
+                self.append(profile, weekday, start, end, slot_type_codes["break"], '')
+            else:
+                self.append(profile, weekday, start, end, slot_type_codes["class"], slot_string)
+        if eod_slot_times:
+            self.append(profile, weekday, *(time.to_seconds() for time in eod_slot_times), slot_type_codes["eod"], '')
+
+    def add_timetable_csv(self, profile: str, timetable_file_path: Path) -> None:
+        """Add all slots from a timetable csv."""
+        with open(timetable_file_path, newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader, None)
+            if header is None:
+                return
+            day_idx = header.index('Day')
+            slot_idxs = [idx for idx in range(len(header)) if idx != day_idx]
+            start_times = [get_time_from_timestring(header[idx]) for idx in slot_idxs]
+            start_seconds = [start_time.to_seconds() for start_time in start_times]
+            end_seconds = [end_time.to_seconds() for end_time in get_slot_end_times(start_times)]
+            for row in reader:
+                row += [''] * (len(header) - len(row))
+                self.add_day(profile, row[day_idx], start_seconds, end_seconds, (row[idx] for idx in slot_idxs))
+
+    def add_store(self, store, profiles: Iterable[str] = None) -> None:
+        """Add all slots of given profiles (default: all profiles) from a
+        magik.store.ProfileStore."""
+        for profile in (store.get_profiles() if profiles is None else profiles):
+            for day in store.get_days(profile):
+                slots = store.get_day_slots(profile, day)
+                self.add_day(profile, day,
+                             [slot.start_seconds for slot in slots],
+                             [slot.end_seconds for slot in slots],
+                             [slot.slot_string for slot in slots])
+
+    def to_numpy(self):
+        """Return the slots as a NumPy structured array. Profile and category
+        ids are stored as fixed width, utf-8 encoded byte strings."""
+        require_numpy()
+        profile = np.array([profile.encode() for profile in self.profile], dtype='S')
+        category = np.array([category.encode() for category in self.category], dtype='S')
+        dtype = np.dtype([('profile', profile.dtype),
+                          ('weekday', 'i1'),
+                          ('start_seconds', 'i4'),
+                          ('end_seconds', 'i4'),
+                          ('slot_type', 'u1'),
+                          ('category', category.dtype)])
+        out = np.empty(len(self), dtype=dtype)
+        out['profile'] = profile
+        out['weekday'] = np.frombuffer(self.weekday, dtype='i1')
+        out['start_seconds'] = np.frombuffer(self.start_seconds, dtype=np.intc)
+        out['end_seconds'] = np.frombuffer(self.end_seconds, dtype=np.intc)
+        out['slot_type'] = np.frombuffer(self.slot_type, dtype='u1')
+        out['category'] = category
+        return out
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("Columnar export requires numpy. Install it with 'pip install numpy'.")
+
+
+def get_profile_id_from_path(timetable_file_path: Path) -> str:
+    """Default profile id of a timetable csv: the file name without its
+    extension, or the name of its directory for profiles using the default
+    timetable file name."""
+    timetable_file_path = Path(timetable_file_path).resolve()
+    if timetable_file_path.name == default_timetable_file_path.name:
+        return timetable_file_path.parent.name
+    return timetable_file_path.stem
+
+
+def get_arrow_table(slots):
+    """Convert a structured array from TimetableColumns.to_numpy to a
+    pyarrow Table. Byte string ids are stored as strings."""
+    import pyarrow as pa
+    arrays = []
+    for name in slots.dtype.names:
+        column = pa.array(slots[name])
+        arrays.append(column.cast(pa.string()) if slots.dtype[name].kind == 'S' else column)
+    return pa.Table.from_arrays(arrays, names=list(slots.dtype.names))
+
+
+def write_timetable_columns(columns: TimetableColumns, output_path: Path) -> None:
+    """Write columns to a file, in a format chosen by the suffix of
+    output_path: '.arrow' or '.feather' for an Arrow IPC file, '.parquet'
+    for a Parquet file, and a .npy file otherwise."""
+    output_path = Path(output_path)
+    slots = columns.to_numpy()
+    if output_path.suffix in arrow_suffixes:
+        import pyarrow as pa
+        table = get_arrow_table(slots)
+        # Written uncompressed, so that loading can memory-map the columns
+        with pa.OSFile(str(output_path), 'wb') as outfile, pa.ipc.new_file(outfile, table.schema) as writer:
+            writer.write_table(table)
+    elif output_path.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(get_arrow_table(slots), output_path)
+    else:
+        with open(output_path, 'wb') as outfile:
+            np.save(outfile, slots, allow_pickle=False)
+
+
+def export_timetables(timetables: Iterable[Tuple[str, Path]], output_path: Path) -> int:
+    """Export (profile_id, timetable_file_path) pairs to output_path (see
+    write_timetable_columns). Returns the number of slots written."""
+    require_numpy()
+    columns = TimetableColumns()
+    for profile, timetable_file_path in timetables:
+        columns.add_timetable_csv(profile, timetable_file_path)
+    write_timetable_columns(columns, output_path)
+    return len(columns)
+
+
+def export_store_timetables(store, output_path: Path, profiles: Iterable[str] = None) -> int:
+    """Export the timetables of profiles in a magik.store.ProfileStore to
+    output_path (see write_timetable_columns). Returns the number of slots
+    written."""
+    require_numpy()
+    columns = TimetableColumns()
+    columns.add_store(store, profiles)
+    write_timetable_columns(columns, output_path)
+    return len(columns)
+
+
+def load_timetable_columns(input_path: Path):
+    """Load an export. Returns a read-only, memory-mapped NumPy structured
+    array for .npy files, and a pyarrow Table for Arrow and Parquet files.
+    The columns of Arrow files are memory-mapped as well, while Parquet
+    files are decompressed and decoded into memory."""
+    input_path = Path(input_path)
+    if input_path.suffix in arrow_suffixes:
+        import pyarrow as pa
+        return pa.ipc.open_file(pa.memory_map(str(input_path))).read_all()
+    if input_path.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(input_path)
+    require_numpy()
+    return np.load(input_path, mmap_mode='r', allow_pickle=False)
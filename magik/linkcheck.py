@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+"""Checks whether the links stored in profile configurations are reachable.
+Links are checked concurrently, connections are reused per host and results
+are cached for a while, so that large sets of links can be checked quickly."""
+
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+link_schemes = ("http", "https")
+
+
+class LinkUsage(NamedTuple):
+    """Where a link was found: profile configuration file, category id and
+    link attribute."""
+    source: str
+    category_id: str
+    link_attribute: str
+
+
+class LinkResult(NamedTuple):
+    """Result of checking a single link. 'status' is the HTTP status code of
+    the last request made (None if no response was received), and 'error'
+    describes why the link is broken, if it is."""
+    url: str
+    ok: bool
+    status: Optional[int] = None
+    error: Optional[str] = None
+
+
+def get_default_cache_file() -> Path:
+    """File that keeps link results between runs of check-links:
+    $XDG_CACHE_HOME/magik/links.json (XDG_CACHE_HOME defaults to ~/.cache)."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(cache_home) / "magik" / "links.json"
+
+
+def is_link(value: str) -> bool:
+    """Return True if given configuration value looks like a http(s) link."""
+    return urlsplit(value.strip()).scheme in link_schemes
+
+
+def collect_links(profiles) -> Dict[str, List[LinkUsage]]:
+    """Collect every link from the 'category_info' of given profiles.
+    Returns a dict with each (deduplicated) link as key and a list of places
+    where it is used as value."""
+    links = {}
+    for profile in profiles:
+        source = str(profile.config_file_path)
+        for category_id, class_info in profile.category_info.items():
+            for link_attribute, value in class_info.items():
+                if value and is_link(value):
+                    usage = LinkUsage(source, category_id, link_attribute)
+                    links.setdefault(value.strip(), []).append(usage)
+    return links
+
+
+class ConnectionPool:
+    """Keeps idle HTTP(S) connections for every (scheme, host, port) so that
+    links on the same host reuse connections instead of opening new ones."""
+    def __init__(self, timeout: float = 5, max_idle_per_host: int = 8) -> None:
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _get_queue(self, key) -> queue.LifoQueue:
+        with self._lock:
+            try:
+                return self._idle[key]
+            except KeyError:
+                idle = self._idle[key] = queue.LifoQueue(self.max_idle_per_host)
+                return idle
+
+    def acquire(self, scheme: str, host: str, port: Optional[int]):
+        """Return an idle connection for the host if there is one, else a
+        new connection. The second value is True if the connection was reused."""
+        try:
+            return self._get_queue((scheme, host, port)).get_nowait(), True
+        except queue.Empty:
+            connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            return connection_class(host, port, timeout=self.timeout), False
+
+    def release(self, scheme: str, host: str, port: Optional[int], connection) -> None:
+        """Return a connection to the pool. The connection is closed if the
+        pool for the host is already full."""
+        try:
+            self._get_queue((scheme, host, port)).put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle_queues, self._idle = list(self._idle.values()), {}
+        for idle in idle_queues:
+            while True:
+                try:
+                    idle.get_nowait().close()
+                except queue.Empty:
+                    break
+
+
+class LinkChecker:
+    """Checks links concurrently using a thread pool. A HEAD request is tried
+    first, and a GET request is made if the server responds to it with an
+    error status. Results are cached for 'cache_ttl' seconds.
+
+    If 'cache_file' is given, working links are also kept in that file when
+    the checker is closed, and links that were found working less than
+    'cache_ttl' seconds ago aren't checked again by later checkers. Broken
+    links are always checked again."""
+    def __init__(self,
+                 timeout: float = 5,
+                 max_workers: int = 64,
+                 max_idle_per_host: int = 8,
+                 cache_ttl: float = 300,
+                 user_agent: str = "magik-link-checker",
+                 cache_file: Optional[Path] = None) -> None:
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.cache_ttl = cache_ttl
+        self.user_agent = user_agent
+        self.cache_file = cache_file
+        self.pool = ConnectionPool(timeout, max_idle_per_host)
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        if cache_file is not None:
+            self.load_cache()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.pool.close()
+        if self.cache_file is not None:
+            self.save_cache()
+
+    def is_expired(self, checked_at: float) -> bool:
+        return time.time() - checked_at > self.cache_ttl
+
+    def get_cached_result(self, url: str) -> Optional[LinkResult]:
+        """Return the cached result for url if it hasn't expired yet."""
+        with self._cache_lock:
+            cached = self._cache.get(url)
+            if cached is None:
+                return None
+            checked_at, result = cached
+            if self.is_expired(checked_at):
+                del self._cache[url]
+                return None
+            return result
+
+    def cache_result(self, result: LinkResult) -> None:
+        with self._cache_lock:
+            self._cache[result.url] = (time.time(), result)
+
+    def load_cache(self) -> None:
+        """Load the unexpired results from the cache file. A missing or
+        unreadable cache file is treated as empty."""
+        try:
+            with open(self.cache_file) as cache_file:
+                entries = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        with self._cache_lock:
+            for url, (checked_at, status) in entries.items():
+                if not self.is_expired(checked_at):
+                    self._cache[url] = (checked_at, LinkResult(url, True, status))
+
+    def save_cache(self) -> None:
+        """Write the unexpired working links to the cache file. The file is
+        replaced atomically, so concurrent runs never read a partial file.
+        Errors are ignored, since the cache only saves time."""
+        with self._cache_lock:
+            entries = {url: (checked_at, result.status) for url, (checked_at, result) in self._cache.items()
+                       if result.ok and not self.is_expired(checked_at)}
+        temporary_path = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(temporary_path, "w") as cache_file:
+                json.dump(entries, cache_file)
+            os.replace(temporary_path, self.cache_file)
+        except OSError:
+            try:
+                os.unlink(temporary_path)
+            except OSError:
+                pass
+
+    def check(self, url: str) -> LinkResult:
+        """Check a single link, using the cache when possible."""
+        result = self.get_cached_result(url)
+        if result is None:
+            result = self._check_uncached(url)
+            self.cache_result(result)
+        return result
+
+    def check_all(self, urls: Iterable[str]) -> Dict[str, LinkResult]:
+        """Check all given links concurrently. Returns a dict with each link
+        as key and its LinkResult as value."""
+        urls = list(dict.fromkeys(urls))
+        workers = max(1, min(self.max_workers, len(urls)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(urls, executor.map(self.check, urls)))
+
+    def _check_uncached(self, url: str) -> LinkResult:
+        parts = urlsplit(url)
+        if parts.scheme not in link_schemes or not parts.hostname:
+            return LinkResult(url, False, error="not a http(s) link")
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        try:
+            target = (parts.scheme, parts.hostname, parts.port)
+        except ValueError as e:
+            return LinkResult(url, False, error=str(e))
+
+        try:
+            status = self._request(target, "HEAD", path, parts.netloc)
+        except OSError as e:
+            # The server is unreachable or didn't respond in time, a GET
+            # request would only wait for the same timeout again.
+            return LinkResult(url, False, error=str(e) or type(e).__name__)
+        except http.client.HTTPException:
+            status = None
+        if status is not None and status < 400:
+            return LinkResult(url, True, status)
+
+        # Some servers reject HEAD requests (e.g. 405, 501, or 404 for
+        # everything) or answer them with an invalid response, so try again
+        # using GET.
+        try:
+            status = self._request(target, "GET", path, parts.netloc)
+        except (OSError, http.client.HTTPException) as e:
+            return LinkResult(url, False, error=str(e) or type(e).__name__)
+        if status < 400:
+            return LinkResult(url, True, status)
+        return LinkResult(url, False, status, error=f"HTTP {status}")
+
+    def _request(self, target: Tuple[str, str, Optional[int]], method: str, path: str, host_header: str) -> int:
+        """Make a request using a pooled connection and return the response
+        status. A reused connection that was closed by the server is retried
+        once with a fresh connection."""
+        headers = {"Host": host_header, "User-Agent": self.user_agent}
+        while True:
+            connection, reused = self.pool.acquire(*target)
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+            except (ConnectionError, http.client.HTTPException):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except OSError:
+                connection.close()
+                raise
+            break
+
+        if method == "HEAD":
+            response.read()
+            reusable = not response.will_close
+        else:
+            # Don't download response bodies, just drop the connection.
+            reusable = False
+        if reusable:
+            self.pool.release(*target, connection)
+        else:
+            connection.close()
+        return response.status
+
+
+def check_profile_links(profiles, **checker_options) -> Tuple[Dict[str, List[LinkUsage]], Dict[str, LinkResult]]:
+    """Collect links from given profiles and check them. Returns the
+    collected links (see collect_links) and the results (see
+    LinkChecker.check_all)."""
+    links = collect_links(profiles)
+    with LinkChecker(**checker_options) as checker:
+        results = checker.check_all(links)
+    return links, results
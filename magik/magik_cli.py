@@ -1,4 +1,14 @@
 #!/usr/bin/env python3
 
+import sys
+from magik.client import forward_command
+
 def main():
-    print("Inside magik-cli!")
+    """Entry point of the magik command. Commands are forwarded to the
+    resident magik server when one is running, and run in this process
+    otherwise."""
+    status = forward_command(sys.argv[1:])
+    if status is not None:
+        sys.exit(status)
+    from magik.main import main as run_in_process
+    run_in_process()
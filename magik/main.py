@@ -1,34 +1,232 @@
 #!/usr/bin/env python3
 
 import argparse
+import sys
+from pathlib import Path
 from magik.userprofile import Profile
+from magik.defaults import (
+    default_first_section_heading,
+    default_config_file_path,
+    default_timetable_file_path,
+    default_general_config,
+    default_subjects_info,
+    default_timetable_contents,
+    default_timetable_fields
+)
 
 def func():
     print("Hello!")
 
-def main():
-    # Initialize profile
-    p = Profile()
-    p.initialize_config_from_files()
+def exit_with_error(error):
+    """Exit with the message of an error caused by the user's input (a
+    missing file, profile store or profile) instead of a traceback"""
+    sys.exit(f"magik: {error.args[0] if isinstance(error, KeyError) else error}")
 
+def get_profile(args, profile_dir=Path('.'), store=None):
+    """Return the profile selected by the command line arguments: a profile
+    from the store if --store is given, else the profile in 'profile_dir'
+    (the current directory by default). An already open ProfileStore for
+    --store can be passed as 'store'."""
+    p = Profile(profile_dir / default_config_file_path, profile_dir / default_timetable_file_path)
+    if args.store:
+        if store is None:
+            from magik.store import ProfileStore
+            store = ProfileStore(profile_dir / args.store)
+        try:
+            p.initialize_config_from_store(store, args.profile)
+        except (FileNotFoundError, KeyError) as e:
+            exit_with_error(e)
+    else:
+        p.initialize_config_from_files()
+    return p
+
+def cmd_check_links(args):
+    """The check-links command"""
+    from magik.linkcheck import check_profile_links, get_default_cache_file
+
+    if args.config_files:
+        profiles = []
+        for config_file_path in args.config_files:
+            p = Profile(config_file_path=Path(config_file_path))
+            p.initialize_config_from_config_file()
+            profiles.append(p)
+    else:
+        profiles = [get_profile(args)]
+
+    links, results = check_profile_links(profiles,
+                                         timeout=args.timeout,
+                                         max_workers=args.workers,
+                                         cache_ttl=args.cache_ttl,
+                                         cache_file=None if args.no_cache else get_default_cache_file())
+    broken = 0
+    for url, result in results.items():
+        if result.ok and not args.verbose:
+            continue
+        broken += not result.ok
+        print(f"{'OK' if result.ok else 'BROKEN'} {url} ({result.status if result.ok else result.error})")
+        for usage in links[url]:
+            print(f"    {usage.source}: {usage.category_id}.{usage.link_attribute}")
+    print(f"Checked {len(results)} links, {broken} broken.")
+    return 1 if broken else 0
+
+def cmd_store_import(args):
+    """The store-import command"""
+    from magik.store import ProfileStore
+    with ProfileStore(args.store_path) as store:
+        store.import_profile(args.profile, Path(args.config_file), Path(args.timetable_file))
+
+def cmd_store_export(args):
+    """The store-export command"""
+    from magik.store import ProfileStore
+    with ProfileStore(args.store_path) as store:
+        try:
+            store.export_profile(args.profile, Path(args.config_file), Path(args.timetable_file),
+                                 overwrite=args.overwrite)
+        except KeyError as e:
+            exit_with_error(e)
+
+def cmd_generate(args):
+    """The generate command"""
+    import configparser
+    from magik.utils import generate_profile_stream
+
+    template = configparser.ConfigParser(interpolation=None)
+    if args.template:
+        if not Path(args.template).is_file():
+            raise FileNotFoundError(f"Template {args.template} doesn't exist.")
+        template.read(args.template)
+    general_config = dict(default_general_config)
+    if template.has_section(default_first_section_heading):
+        general_config.update(template[default_first_section_heading])
+    category_info_template = dict(template['Category']) if template.has_section('Category') else default_subjects_info
+    timetable_days = [row['Day'] for row in default_timetable_contents]
+    timetable_times = default_timetable_fields[1:]
+    if template.has_section('Timetable'):
+        timetable = template['Timetable']
+        timetable_days = [day.strip() for day in timetable.get('days', ','.join(timetable_days)).split(',')]
+        timetable_times = [time.strip() for time in timetable.get('times', ','.join(timetable_times)).split(',')]
+
+    with open(args.course_list) as course_list:
+        number_of_courses = generate_profile_stream(Path(args.config_file),
+                                                    Path(args.timetable_file),
+                                                    default_first_section_heading,
+                                                    general_config,
+                                                    course_list,
+                                                    category_info_template,
+                                                    timetable_days,
+                                                    timetable_times,
+                                                    overwrite=args.overwrite)
+    print(f"Generated a profile with {number_of_courses} courses.")
+
+def cmd_export_columns(args):
+    """The export-columns command"""
+    from magik.columnar import export_store_timetables, export_timetables, get_profile_id_from_path
+
+    if args.store:
+        from magik.store import ProfileStore
+        with ProfileStore(args.store) as store:
+            number_of_slots = export_store_timetables(store, Path(args.output))
+    else:
+        timetables = []
+        for timetable in args.timetable_files or [str(default_timetable_file_path)]:
+            profile_id, _, timetable_file_path = timetable.rpartition('=')
+            timetables.append((profile_id or get_profile_id_from_path(timetable_file_path), Path(timetable_file_path)))
+        number_of_slots = export_timetables(timetables, Path(args.output))
+    print(f"Exported {number_of_slots} slots to {args.output}")
+
+def cmd_serve(args):
+    """The serve command"""
+    from magik.server import serve
+    serve(args.socket)
+
+def run_profile_command(args):
+    """Run a command that acts on a single profile"""
+    return args.profile_command(get_profile(args), args)
+
+def build_parser():
+    """Return the argument parser for the magik command line"""
     parser = argparse.ArgumentParser()
+    parser.add_argument('--no-server', action='store_true', help="don't forward the command to a running magik server")
+    parser.add_argument('--store', help='read the profile from this profile store (SQLite database)')
+    parser.add_argument('--profile', default='default', help='name of the profile in the store')
     subparsers = parser.add_subparsers(help="sub-command help")
 
     # watch command
     watch_parser = subparsers.add_parser('watch', help='watch help')
-    watch_parser.set_defaults(func=(lambda args: p.cmd_watch()))
+    watch_parser.set_defaults(func=run_profile_command,
+                              profile_command=(lambda p, args: p.cmd_watch()))
 
     # open command
     open_parser = subparsers.add_parser('open', help='open help')
     open_parser.add_argument('category')
     open_parser.add_argument('link_type')
-    open_parser.set_defaults(func=(lambda args: p.cmd_open(args.category, args.link_type)))
+    open_parser.set_defaults(func=run_profile_command,
+                             profile_command=(lambda p, args: p.cmd_open(args.category, args.link_type)))
     # parser.add_argument('echo', help="echos that variable in the console")
     # parser.add_argument('-v', '--verbosity', help="increase output verbosity", action="store_true")
 
+    # check-links command
+    check_links_parser = subparsers.add_parser('check-links', help='check that all links in the configuration are reachable')
+    check_links_parser.add_argument('config_files', nargs='*', help='configuration files to check (default: current profile)')
+    check_links_parser.add_argument('--timeout', type=float, default=5, help='timeout for each request, in seconds')
+    check_links_parser.add_argument('--workers', type=int, default=64, help='number of links checked concurrently')
+    check_links_parser.add_argument('--cache-ttl', type=float, default=3600,
+                                    help='seconds for which a working link is not checked again (default: 3600)')
+    check_links_parser.add_argument('--no-cache', action='store_true',
+                                    help='check every link, and don\'t keep results in $XDG_CACHE_HOME/magik')
+    check_links_parser.add_argument('-v', '--verbose', action='store_true', help='also list working links')
+    check_links_parser.set_defaults(func=cmd_check_links)
+
+    # store-import and store-export commands
+    for command, help_text, func in (('store-import', 'import profile files into a profile store', cmd_store_import),
+                                     ('store-export', 'export a profile from a profile store to files', cmd_store_export)):
+        store_parser = subparsers.add_parser(command, help=help_text)
+        store_parser.add_argument('store_path', help='profile store (SQLite database)')
+        store_parser.add_argument('profile', help='name of the profile in the store')
+        store_parser.add_argument('--config-file', default=str(default_config_file_path))
+        store_parser.add_argument('--timetable-file', default=str(default_timetable_file_path))
+        if command == 'store-export':
+            store_parser.add_argument('--overwrite', action='store_true', help='overwrite existing files')
+        store_parser.set_defaults(func=func)
+
+    # generate command
+    generate_parser = subparsers.add_parser('generate', help='generate a profile from a list of courses')
+    generate_parser.add_argument('course_list', help='file with one course name per line')
+    generate_parser.add_argument('template', nargs='?',
+                                 help='ini file with optional [Configuration], [Category] (attributes, '
+                                 'may use {id} and {name}) and [Timetable] (days, times) sections')
+    generate_parser.add_argument('--config-file', default=str(default_config_file_path))
+    generate_parser.add_argument('--timetable-file', default=str(default_timetable_file_path))
+    generate_parser.add_argument('--overwrite', action='store_true', help='overwrite existing files')
+    generate_parser.set_defaults(func=cmd_generate)
+
+    # export-columns command
+    export_columns_parser = subparsers.add_parser('export-columns', help='export timetables as columns for analytics')
+    export_columns_parser.add_argument('output', help='output file: .npy, .arrow (Arrow IPC file) or .parquet')
+    export_columns_parser.add_argument('timetable_files', nargs='*',
+                                       help='timetable csv files, optionally as PROFILE_ID=PATH (default: current '
+                                       'profile). All profiles are exported when --store is given')
+    export_columns_parser.set_defaults(func=cmd_export_columns)
+
+    # serve command
+    serve_parser = subparsers.add_parser('serve', help='keep profiles loaded and run watch/open commands for other magik calls')
+    serve_parser.add_argument('--socket', help='path of the unix socket to listen on')
+    serve_parser.set_defaults(func=cmd_serve)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+
     # Execute the appropriate function
-    args = parser.parse_args()
-    args.func(args)
+    args = parser.parse_args(argv)
+    if not hasattr(args, 'func'):
+        parser.print_help()
+        return
+    try:
+        status = args.func(args)
+    except (FileNotFoundError, FileExistsError) as e:
+        exit_with_error(e)
+    sys.exit(status)
     # if args.verbosity:
     #     print("Verbosity turned on")
 
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+"""Resident magik server. Keeps profiles loaded between calls and runs the
+commands forwarded by magik.client, so that repeated calls of magik don't
+have to start python and read the profile files every time.
+
+Start it with 'magik serve'. Profiles are reloaded when their files change."""
+
+import io
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from magik.client import (
+    decode_request,
+    encode_reply,
+    get_private_socket_dir,
+    get_socket_path,
+    not_handled_reply,
+    receive_all,
+)
+from magik.defaults import default_config_file_path, default_timetable_file_path
+from magik.main import build_parser, get_profile
+
+
+def get_mtime(file_path: Path):
+    try:
+        return file_path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+class MagikRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            cwd, argv = decode_request(receive_all(self.request))
+        except (ConnectionError, UnicodeDecodeError):
+            return
+        self.request.sendall(self.server.run_command(argv, Path(cwd)))
+
+
+class MagikServer(socketserver.UnixStreamServer):
+    """Unix socket server that runs magik commands. Commands are run one at
+    a time, since profiles are shared between commands."""
+    def __init__(self, socket_path: str) -> None:
+        self.parser = build_parser()
+        self.profiles = {}
+        self.stores = {}
+        super().__init__(socket_path, MagikRequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        for store in self.stores.values():
+            store.close()
+        self.stores.clear()
+
+    def get_store(self, store_path: Path):
+        """Return the ProfileStore for given path, opening it only once so
+        that its connections are reused by every profile read from it."""
+        store_path = store_path.resolve()
+        try:
+            return self.stores[store_path]
+        except KeyError:
+            from magik.store import ProfileStore
+            store = self.stores[store_path] = ProfileStore(store_path)
+            return store
+
+    def get_profile_files(self, args, profile_dir: Path):
+        """Return the files a profile is read from."""
+        if args.store:
+            store_path = profile_dir / args.store
+            return [store_path, Path(f"{store_path}-wal")]
+        return [profile_dir / default_config_file_path, profile_dir / default_timetable_file_path]
+
+    def get_profile(self, args, profile_dir: Path):
+        """Return the profile selected by the arguments, reusing the loaded
+        profile if none of its files changed since it was loaded."""
+        key = (profile_dir, args.store, args.profile if args.store else None)
+        profile_files = self.get_profile_files(args, profile_dir)
+        cached = self.profiles.get(key)
+        if cached is not None:
+            mtimes, p = cached
+            if mtimes == [get_mtime(file_path) for file_path in profile_files]:
+                return p
+        store = self.get_store(profile_dir / args.store) if args.store else None
+        p = get_profile(args, profile_dir, store)
+        self.profiles[key] = ([get_mtime(file_path) for file_path in profile_files], p)
+        return p
+
+    def run_command(self, argv, profile_dir: Path) -> bytes:
+        """Run a magik command and return the reply sent to the client (see
+        magik.client for its format)."""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                args = self.parser.parse_args(argv)
+            except SystemExit:
+                return not_handled_reply
+            if not hasattr(args, 'profile_command'):
+                return not_handled_reply
+            try:
+                status = args.profile_command(self.get_profile(args, profile_dir), args)
+            except SystemExit as e:
+                status = e.code
+                if status is not None and not isinstance(status, int):
+                    print(status, file=sys.stderr)
+                    status = 1
+            except Exception:
+                traceback.print_exc()
+                status = 1
+        return encode_reply(status or 0, stdout.getvalue(), stderr.getvalue())
+
+
+def is_server_running(socket_path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def make_private_dir(dir_path: str) -> None:
+    """Create a directory only the current user can access. An existing
+    directory is only accepted if it already is private, since it may have
+    been created by another user in a shared directory like /tmp."""
+    try:
+        os.mkdir(dir_path, 0o700)
+    except FileExistsError:
+        st = os.lstat(dir_path)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+            raise PermissionError(f"{dir_path} is not a private directory of the current user")
+
+
+def create_server(socket_path: str = None) -> MagikServer:
+    """Create a server listening on given socket (see
+    magik.client.get_socket_path for the default). A stale socket file left
+    behind by a server that is no longer running is removed."""
+    socket_path = socket_path or get_socket_path()
+    if os.path.dirname(socket_path) == get_private_socket_dir():
+        make_private_dir(os.path.dirname(socket_path))
+    if os.path.exists(socket_path):
+        if is_server_running(socket_path):
+            raise FileExistsError(f"A magik server is already listening on {socket_path}")
+        os.unlink(socket_path)
+    old_umask = os.umask(0o077)
+    try:
+        return MagikServer(socket_path)
+    finally:
+        os.umask(old_umask)
+
+
+def serve(socket_path: str = None) -> None:
+    """Run a server until interrupted or terminated."""
+    server = create_server(socket_path)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"magik server listening on {server.server_address}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(server.server_address)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+
+"""SQLite storage backend for profiles. Profiles are imported from their
+config.ini/timetable.csv files into indexed tables, so that loading a
+profile, looking up its current slot or querying across many profiles only
+reads the rows that are needed. Profiles can be exported back to the file
+formats at any time."""
+
+import configparser
+import csv
+import queue
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from magik.structs import ClassInfo, Time
+from magik.utils import get_slot_end_times, get_time_from_timestring
+from magik.defaults import default_first_section_heading, default_general_config
+
+schema = """
+CREATE TABLE IF NOT EXISTS settings (
+    profile TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (profile, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS categories (
+    profile TEXT NOT NULL,
+    category_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (profile, category_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS category_attributes (
+    profile TEXT NOT NULL,
+    category_id TEXT NOT NULL,
+    attribute TEXT NOT NULL,
+    value TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (profile, category_id, attribute)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS category_attributes_by_value ON category_attributes (attribute, value);
+CREATE TABLE IF NOT EXISTS days (
+    profile TEXT NOT NULL,
+    weekday TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (profile, weekday)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS slots (
+    profile TEXT NOT NULL,
+    weekday TEXT NOT NULL,
+    start_seconds INTEGER NOT NULL,
+    end_seconds INTEGER NOT NULL,
+    slot_string TEXT NOT NULL,
+    PRIMARY KEY (profile, weekday, start_seconds)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS slots_by_time ON slots (weekday, start_seconds);
+"""
+
+profile_tables = ("settings", "categories", "category_attributes", "days", "slots")
+
+
+class StoredSlot(NamedTuple):
+    """A slot as stored in the database"""
+    profile: str
+    weekday: str
+    start_seconds: int
+    end_seconds: int
+    slot_string: str
+
+
+def get_timestring_from_seconds(seconds: int) -> str:
+    """Returns time string of the format 'HH:MM' used in timetable files."""
+    return f"{seconds // 3600:02}:{seconds % 3600 // 60:02}"
+
+
+class ProfileStore:
+    """SQLite database containing any number of profiles, each identified by
+    a name. Connections are pooled, so a ProfileStore can be shared between
+    threads. 'database_path' must be a file, since every pooled connection
+    opens it separately.
+
+    Only import_profile creates the database if it doesn't exist yet. Every
+    other method raises FileNotFoundError for a missing database."""
+    def __init__(self, database_path, pool_size: int = 4) -> None:
+        self.database_path = str(database_path)
+        self._pool = queue.LifoQueue(pool_size)
+
+    def _connect(self, create: bool = False) -> sqlite3.Connection:
+        database_uri = Path(self.database_path).absolute().as_uri() + ("?mode=rwc" if create else "?mode=rw")
+        try:
+            return sqlite3.connect(database_uri, uri=True, check_same_thread=False)
+        except sqlite3.OperationalError:
+            if not create and not Path(self.database_path).is_file():
+                raise FileNotFoundError(f"Profile store {self.database_path} doesn't exist.")
+            raise
+
+    def _create_schema(self) -> None:
+        """Create the database and its tables if they don't exist yet."""
+        connection = self._connect(create=True)
+        with connection:
+            connection.executescript(schema)
+        connection.execute("PRAGMA journal_mode=WAL")
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection from the pool. Changes are committed when the
+        block exits without an exception and rolled back otherwise."""
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            with connection:
+                yield connection
+        finally:
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Import and export
+
+    def import_profile(self, profile: str, config_file_path: Path, timetable_file_path: Path) -> None:
+        """Import a profile from its configuration file and timetable csv.
+        An existing profile with the same name is replaced."""
+        config = configparser.ConfigParser()
+        if not Path(config_file_path).is_file():
+            raise FileNotFoundError(f"Configuration file {config_file_path} doesn't exist.")
+        config.read(config_file_path)
+        general_config = dict(config[default_first_section_heading])
+        category_heading = general_config.get('category_heading', default_general_config['category_heading'])
+
+        with open(timetable_file_path, newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            timetable_rows = []
+            for row in reader:
+                day = row.pop('Day')
+                timetable_rows.append((day, row))
+
+        self._create_schema()
+        with self.connection() as connection:
+            self._delete_profile(connection, profile)
+            connection.executemany(
+                "INSERT INTO settings VALUES (?, ?, ?, ?)",
+                ((profile, key, value, position)
+                 for position, (key, value) in enumerate(general_config.items())))
+            categories = list(config[category_heading].items())
+            connection.executemany(
+                "INSERT INTO categories VALUES (?, ?, ?, ?)",
+                ((profile, category_id, name, position)
+                 for position, (category_id, name) in enumerate(categories)))
+            connection.executemany(
+                "INSERT INTO category_attributes VALUES (?, ?, ?, ?, ?)",
+                ((profile, category_id, attribute, value, position)
+                 for category_id, name in categories
+                 for position, (attribute, value) in enumerate(config[name].items())))
+            connection.executemany(
+                "INSERT INTO days VALUES (?, ?, ?)",
+                ((profile, day, position) for position, (day, _) in enumerate(timetable_rows)))
+            for day, row in timetable_rows:
+                start_times = list(map(get_time_from_timestring, row.keys()))
+                end_times = get_slot_end_times(start_times)
+                connection.executemany(
+                    "INSERT INTO slots VALUES (?, ?, ?, ?, ?)",
+                    ((profile, day, start_time.to_seconds(), end_time.to_seconds(), slot_string or '')
+                     for start_time, end_time, slot_string in zip(start_times, end_times, row.values())))
+
+    def export_profile(self, profile: str, config_file_path: Path, timetable_file_path: Path, overwrite=False) -> None:
+        """Write a stored profile back to a configuration file and a
+        timetable csv. Set overwrite=True to overwrite existing files."""
+        config_file_path, timetable_file_path = Path(config_file_path), Path(timetable_file_path)
+        for file_path in (config_file_path, timetable_file_path):
+            if file_path.is_file() and not overwrite:
+                raise FileExistsError(f"{file_path} already exists. Set overwrite=True to overwrite it")
+        general_config = self.get_settings(profile)
+        if not general_config:
+            raise KeyError(f"Profile {profile} doesn't exist in the store")
+
+        config = configparser.ConfigParser()
+        config[default_first_section_heading] = general_config
+        category_heading = general_config.get('category_heading', default_general_config['category_heading'])
+        with self.connection() as connection:
+            categories = connection.execute(
+                "SELECT category_id, name FROM categories WHERE profile = ? ORDER BY position",
+                (profile,)).fetchall()
+            config[category_heading] = dict(categories)
+            for category_id, name in categories:
+                config[name] = dict(connection.execute(
+                    "SELECT attribute, value FROM category_attributes WHERE profile = ? AND category_id = ? ORDER BY position",
+                    (profile, category_id)))
+            columns = [start_seconds for (start_seconds,) in connection.execute(
+                "SELECT DISTINCT start_seconds FROM slots WHERE profile = ? ORDER BY start_seconds",
+                (profile,))]
+        timetable_fields = ["Day"] + [get_timestring_from_seconds(seconds) for seconds in columns]
+        timetable_contents = []
+        for day in self.get_days(profile):
+            row = {"Day": day}
+            for slot in self.get_day_slots(profile, day):
+                row[get_timestring_from_seconds(slot.start_seconds)] = slot.slot_string
+            timetable_contents.append(row)
+
+        with open(config_file_path, 'w') as configfile:
+            config.write(configfile)
+        with open(timetable_file_path, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=timetable_fields)
+            writer.writeheader()
+            writer.writerows(timetable_contents)
+
+    def delete_profile(self, profile: str) -> None:
+        with self.connection() as connection:
+            self._delete_profile(connection, profile)
+
+    def _delete_profile(self, connection: sqlite3.Connection, profile: str) -> None:
+        for table in profile_tables:
+            connection.execute(f"DELETE FROM {table} WHERE profile = ?", (profile,))
+
+    # Per-profile reads
+
+    def get_profiles(self) -> List[str]:
+        """Return the names of all stored profiles."""
+        with self.connection() as connection:
+            return [profile for (profile,) in connection.execute(
+                "SELECT DISTINCT profile FROM settings ORDER BY profile")]
+
+    def get_settings(self, profile: str) -> Dict[str, str]:
+        """Return the general configuration of a profile."""
+        with self.connection() as connection:
+            return dict(connection.execute(
+                "SELECT key, value FROM settings WHERE profile = ? ORDER BY position", (profile,)))
+
+    def get_category_info(self, profile: str, category: str) -> Dict[str, ClassInfo]:
+        """Return dict of category_id and ClassInfo objects, like
+        Profile.get_config_from_config_file. 'category' is the key under which
+        the category name is stored in each ClassInfo."""
+        category_info_dict = {}
+        with self.connection() as connection:
+            categories = connection.execute(
+                "SELECT category_id, name FROM categories WHERE profile = ? ORDER BY position",
+                (profile,)).fetchall()
+            for category_id, name in categories:
+                category_info = {category: name}
+                category_info.update(connection.execute(
+                    "SELECT attribute, value FROM category_attributes WHERE profile = ? AND category_id = ? ORDER BY position",
+                    (profile, category_id)))
+                category_info_dict[category_id] = ClassInfo(category_info)
+        return category_info_dict
+
+    def get_days(self, profile: str) -> List[str]:
+        """Return the days in the timetable of a profile."""
+        with self.connection() as connection:
+            return [day for (day,) in connection.execute(
+                "SELECT weekday FROM days WHERE profile = ? ORDER BY position", (profile,))]
+
+    def get_day_slots(self, profile: str, weekday: str) -> List[StoredSlot]:
+        """Return the slots of a profile on given day, in order."""
+        with self.connection() as connection:
+            return [StoredSlot(*row) for row in connection.execute(
+                "SELECT profile, weekday, start_seconds, end_seconds, slot_string FROM slots "
+                "WHERE profile = ? AND weekday = ? ORDER BY start_seconds",
+                (profile, weekday))]
+
+    def get_dayschedule_dict(self, profile: str, weekday: str) -> Dict[str, str]:
+        """Return the timetable row of a profile on given day, in the format
+        accepted by Profile.get_dayschedule_from_dict."""
+        return {get_timestring_from_seconds(slot.start_seconds): slot.slot_string
+                for slot in self.get_day_slots(profile, weekday)}
+
+    def get_current_slot(self, profile: str, weekday: str, current_time: Time) -> Optional[StoredSlot]:
+        """Return the slot of a profile at given time, or None if no slot in
+        the timetable covers that time."""
+        seconds = current_time.to_seconds()
+        with self.connection() as connection:
+            row = connection.execute(
+                "SELECT profile, weekday, start_seconds, end_seconds, slot_string FROM slots "
+                "WHERE profile = ? AND weekday = ? AND start_seconds <= ? "
+                "ORDER BY start_seconds DESC LIMIT 1",
+                (profile, weekday, seconds)).fetchone()
+        if row is None or row[3] <= seconds:
+            return None
+        return StoredSlot(*row)
+
+    # Cross-profile queries
+
+    def get_slots_at(self, weekday: str, current_time: Time) -> List[StoredSlot]:
+        """Return the slots of all profiles at given time."""
+        seconds = current_time.to_seconds()
+        with self.connection() as connection:
+            return [StoredSlot(*row) for row in connection.execute(
+                "SELECT profile, weekday, start_seconds, end_seconds, slot_string FROM slots "
+                "WHERE weekday = ? AND start_seconds <= ? AND end_seconds > ? ORDER BY profile",
+                (weekday, seconds, seconds))]
+
+    def find_attribute_usages(self, attribute: str, value: str) -> List[tuple]:
+        """Return (profile, category_id) pairs of all categories whose
+        'attribute' is set to 'value', for example all categories using a
+        particular live_lecture_link."""
+        with self.connection() as connection:
+            return connection.execute(
+                "SELECT profile, category_id FROM category_attributes "
+                "WHERE attribute = ? AND value = ? ORDER BY profile, category_id",
+                (attribute, value)).fetchall()
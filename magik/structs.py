@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 
-from typing import Dict
+from typing import Any, Callable, Dict, Iterator
 from collections import UserDict
+from collections.abc import Mapping
 import time
 import webbrowser
 
@@ -346,3 +347,49 @@ class TimeTable():
     def from_dict(self):
         """Get timetable from dict"""
         pass
+
+
+class LazyTimeTable(Mapping):
+    """Dictionary of DaySchedules that are only built when first accessed.
+    Key: day(string), Value: DaySchedule.
+
+    'day_sources' maps each day to whatever raw data describes it (a timetable
+    row, a database key etc.), and 'build_dayschedule' turns that raw data
+    into a DaySchedule. Each DaySchedule is built at most once. A KeyError
+    raised while building a DaySchedule (e.g. an unknown category id in the
+    timetable) is raised as a ValueError, so that it isn't mistaken for a
+    missing day."""
+    def __init__(self, day_sources: Dict[str, Any],
+                 build_dayschedule: Callable[[Any], DaySchedule]) -> None:
+        self._day_sources = dict(day_sources)
+        self._build_dayschedule = build_dayschedule
+        self._dayschedules = {}
+
+    def __repr__(self) -> str:
+        return f"<LazyTimeTable: {list(self._day_sources)}>"
+
+    def __getitem__(self, day: str) -> DaySchedule:
+        try:
+            return self._dayschedules[day]
+        except KeyError:
+            day_source = self._day_sources[day]
+        try:
+            dayschedule = self._build_dayschedule(day_source)
+        except KeyError as e:
+            # A KeyError here would look like a missing day to callers
+            raise ValueError(f"Invalid slot {e} in the timetable of {day}") from e
+        self._dayschedules[day] = dayschedule
+        return dayschedule
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._day_sources)
+
+    def __len__(self) -> int:
+        return len(self._day_sources)
+
+    def __contains__(self, day) -> bool:
+        return day in self._day_sources
+
+    def is_built(self, day: str) -> bool:
+        """Return True if the DaySchedule for given day was already built."""
+        return day in self._dayschedules
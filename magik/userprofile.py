@@ -7,8 +7,8 @@ import configparser
 from typing import Dict
 import webbrowser
 
-from magik.structs import Time, Slot, EmptySlot, BreakSlot, ClassSlot, ZeroSlot, EODSlot, ClassInfo, DaySchedule
-from magik.utils import get_time_from_timestring, generate_config_file, generate_timetable
+from magik.structs import Time, Slot, EmptySlot, BreakSlot, ClassSlot, ZeroSlot, EODSlot, ClassInfo, DaySchedule, LazyTimeTable
+from magik.utils import get_time_from_timestring, get_slot_end_times, get_day_boundary_times, generate_config_file, generate_timetable
 from magik.defaults import (
     default_first_section_heading,
     default_category_list,
@@ -40,7 +40,7 @@ class Profile:
         """Initialize the 'config', 'category_info' and 'timetable' attributes
         by reading the configuration file and the timetable csv file."""
         # Read default config first. Overwrite with user config as necessary
-        self.config = default_general_config
+        self.config = dict(default_general_config)
         try:
             self.generate_default_profile_config()
             _, self.category_info = self.get_config_from_config_file()
@@ -54,6 +54,29 @@ class Profile:
             pass
         self.timetable = self.get_timetable_from_timetable_csv()
 
+    def initialize_config_from_config_file(self):
+        """Initialize only the 'config' and 'category_info' attributes by
+        reading an existing configuration file. Unlike
+        initialize_config_from_files, no default files are generated."""
+        self.config = dict(default_general_config)
+        user_config, self.category_info = self.get_config_from_config_file()
+        self.config.update(user_config)
+
+    def initialize_config_from_store(self, store, profile_name: str):
+        """Initialize the 'config', 'category_info' and 'timetable' attributes
+        from a profile stored in a magik.store.ProfileStore. Only the rows
+        belonging to this profile are read, and the slots of a day are only
+        read when that day is accessed."""
+        user_config = store.get_settings(profile_name)
+        if not user_config:
+            raise KeyError(f"Profile {profile_name} doesn't exist in the store")
+        self.config = dict(default_general_config)
+        self.category_info = store.get_category_info(profile_name, self.config['category_name'])
+        self.config.update(user_config)
+        self.timetable = LazyTimeTable(
+            {day: day for day in store.get_days(profile_name)},
+            lambda day: self.get_dayschedule_from_dict(store.get_dayschedule_dict(profile_name, day)))
+
     def generate_default_profile_config(self, overwrite=False):
         """Generate a default configuration file if it doesn't exist. Set
         overwrite=True to overwrite the existing timetable"""
@@ -100,15 +123,16 @@ class Profile:
         return dict(config[default_first_section_heading]), category_info_dict
 
     def get_timetable_from_timetable_csv(self):
-        """Extracts timetable from the profile's timetable CSV."""
-        timetable_dict = {}
+        """Extracts timetable from the profile's timetable CSV. Only the raw
+        rows are read here; the DaySchedule of a day is built the first time
+        that day is accessed."""
+        timetable_rows = {}
         with open(self.timetable_file_path, newline='') as csvfile:
             reader = csv.DictReader(csvfile)
             for row in reader:
                 day = row.pop('Day')
-                timetable_dict[day] = self.get_dayschedule_from_dict(row)
-        #print(timetable_dict)
-        return timetable_dict
+                timetable_rows[day] = row
+        return LazyTimeTable(timetable_rows, self.get_dayschedule_from_dict)
 
     def get_dayschedule_from_dict(self, dayschedule_dict: Dict[str, str]) -> DaySchedule:
         """Return DaySchedule Object created using given dict as input. In
@@ -116,26 +140,22 @@ class Profile:
         and a EODSlot is added to the end of the dayschedule."""
         out = {}
         if len(dayschedule_dict)>0:
-            last_slot_length = 60*60 #can possibly set this as a configuration variable
-            time_lst = list(map(get_time_from_timestring, dayschedule_dict.keys()))
-
-            # Setting the last time
-            last_time = time_lst[-1] + last_slot_length
-            last_time = last_time if last_time > time_lst[-1] else Time(23,59,59) #preventing time overflow
-            time_lst.append(last_time)
+            start_times = list(map(get_time_from_timestring, dayschedule_dict.keys()))
+            end_times = get_slot_end_times(start_times)
+            zero_slot_times, eod_slot_times = get_day_boundary_times(start_times[0], end_times[-1])
 
-            if time_lst[0] != Time(0,0,0):
-                out[Time(0,0,0)] = ZeroSlot(Time(0,0,0), time_lst[0])
+            if zero_slot_times:
+                out[zero_slot_times[0]] = ZeroSlot(*zero_slot_times)
             for idx, slot in enumerate(dayschedule_dict.values()):
-                start_time = time_lst[idx]
-                end_time = time_lst[idx+1]
+                start_time = start_times[idx]
+                end_time = end_times[idx]
                 out[start_time] = self.get_slot_from_slotstring(slot, start_time, end_time)
                 if idx > 0:
                     previous_slot.next_slot = out[start_time]
                 previous_slot = out[start_time]
-            if end_time != Time(23,59,59):
-                out[end_time] = EODSlot(end_time, Time(23,59,59))
-                previous_slot.next_slot = out[end_time]
+            if eod_slot_times:
+                out[eod_slot_times[0]] = EODSlot(*eod_slot_times)
+                previous_slot.next_slot = out[eod_slot_times[0]]
         return DaySchedule(out)
 
     def get_slot_from_slotstring(self, slot_string: str, start_time: Time, end_time: Time) -> Slot:
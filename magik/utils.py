@@ -5,7 +5,10 @@
 from pathlib import Path
 import configparser
 import csv
-from typing import Dict
+import itertools
+import shutil
+import tempfile
+from typing import Dict, List
 
 from magik.structs import Time, Slot
 
@@ -62,19 +65,124 @@ def generate_config_file(config_file_path,
 def get_ids_from_category_names(category_names, delimiter=" "):
     """Generates id from first letter of the words in section (subject) name. Assume words
     in section names are space separated by default"""
-    category_ids = []
+    return list(iter_ids_from_category_names(category_names, delimiter))
+
+def iter_ids_from_category_names(category_names, delimiter=" "):
+    """Same as get_ids_from_category_names, but yields the ids one at a time.
+    Colliding ids get a '-2', '-3', ... suffix. The next free suffix of every
+    id is remembered, so this takes linear time even when many names share
+    the same initials."""
+    used_ids = set()
+    next_suffix = {}
     for category_name in category_names:
         words = category_name.split(delimiter)
         category_id = ''.join([word[0] for word in words]).lower()
-        if category_id in category_ids:
+        if category_id in used_ids:
             base_category_id = category_id
-            idx = 2
-            category_id += ("-"+str(idx))
-            while category_id in category_ids:
+            idx = next_suffix.get(base_category_id, 2)
+            category_id = base_category_id + "-" + str(idx)
+            while category_id in used_ids:
                 idx += 1
                 category_id = base_category_id + "-" + str(idx)
-        category_ids.append(category_id)
-    return category_ids
+            next_suffix[base_category_id] = idx + 1
+        used_ids.add(category_id)
+        yield category_id
+
+def write_config_option(configfile, key, value):
+    """Write an option to an open configuration file, in the same format as
+    ConfigParser.write. '%' is escaped as '%%', since configuration files are
+    read with ConfigParser's default interpolation."""
+    value = str(value).replace('%', '%%').replace('\n', '\n\t')
+    configfile.write(f"{key.lower()} = {value}\n")
+
+def write_config_section(configfile, section, items):
+    """Write a section to an open configuration file, in the same format as
+    ConfigParser.write"""
+    configfile.write(f"[{section}]\n")
+    for key, value in items:
+        write_config_option(configfile, key, value)
+    configfile.write("\n")
+
+def generate_config_file_stream(config_file_path,
+                                first_section_heading,
+                                general_config,
+                                category_names,
+                                category_info,
+                                overwrite=False):
+    """Generate a configuration file like generate_config_file, but write it
+    section by section instead of building it in memory. 'category_names'
+    can be any iterable (e.g. a file object) and is only iterated once.
+    'category_info' is either a dict that is written into every category
+    section, or a function that takes (category_id, category_name) and
+    returns the dict for that category.
+
+    Returns the number of categories written."""
+    config_file = Path(config_file_path)
+    if config_file.is_file() and not overwrite:
+        raise FileExistsError("Configuration file already exists. Set overwrite=True to overwrite the existing file")
+
+    written_sections = set()
+    category_names = (category_name.strip() for category_name in category_names)
+    category_names, names_for_ids = itertools.tee(category_name for category_name in category_names if category_name)
+    category_ids = iter_ids_from_category_names(names_for_ids)
+    with open(config_file, 'w') as configfile, tempfile.TemporaryFile('w+') as category_sections:
+        write_config_section(configfile, first_section_heading, general_config.items())
+        configfile.write(f"[{general_config['category_heading']}]\n")
+        # Category sections are written to a temporary file while the category
+        # list is being written, and appended to the configuration file at the end.
+        for category_name, category_id in zip(category_names, category_ids):
+            write_config_option(configfile, category_id, category_name)
+            if category_name in written_sections:
+                continue
+            written_sections.add(category_name)
+            info = category_info(category_id, category_name) if callable(category_info) else category_info
+            write_config_section(category_sections, category_name, info.items())
+        configfile.write("\n")
+        category_sections.seek(0)
+        shutil.copyfileobj(category_sections, configfile)
+    return len(written_sections)
+
+def generate_profile_stream(config_file_path,
+                            timetable_file_path,
+                            first_section_heading,
+                            general_config,
+                            category_names,
+                            category_info_template,
+                            timetable_days,
+                            timetable_times,
+                            overwrite=False):
+    """Generate a configuration file and a timetable for a (possibly very
+    large) list of categories, without holding either file in memory.
+
+    The values in 'category_info_template' can contain '{id}' and '{name}'
+    placeholders, which are replaced by the id and name of each category.
+    The timetable has a row for each of 'timetable_days' and a column for
+    each of 'timetable_times', filled with category ids in the order in which
+    the categories were given. Returns the number of categories written."""
+    for file_path in (config_file_path, timetable_file_path):
+        if Path(file_path).is_file() and not overwrite:
+            raise FileExistsError(f"{file_path} already exists. Set overwrite=True to overwrite it")
+
+    number_of_slots = len(timetable_days) * len(timetable_times)
+    timetable_ids = []
+    def get_category_info(category_id, category_name):
+        if len(timetable_ids) < number_of_slots:
+            timetable_ids.append(category_id)
+        return {key: value.format(id=category_id, name=category_name)
+                for key, value in category_info_template.items()}
+
+    number_of_categories = generate_config_file_stream(config_file_path,
+                                                       first_section_heading,
+                                                       general_config,
+                                                       category_names,
+                                                       get_category_info,
+                                                       overwrite=True)
+    slot_strings = itertools.cycle(timetable_ids or [''])
+    timetable_fields = ["Day"] + list(timetable_times)
+    timetable_contents = ({"Day": day, **{time: next(slot_strings) for time in timetable_times}}
+                          for day in timetable_days)
+    generate_timetable(timetable_file_path, timetable_fields, timetable_contents, overwrite=True)
+    return number_of_categories
 
 def get_timetable_from_csv():
     timetable_file = Path(timetable_file_name)
@@ -96,3 +204,22 @@ def get_time_from_timestring(time_string: str, delimiter: str = ":") -> Time:
     """Returns Time object from time string. time_string is of the format 'HH:MM'"""
     hrs, mins = map(int, time_string.split(delimiter))
     return Time(hrs, mins, 0)
+
+def get_slot_end_times(start_times: List[Time], last_slot_length: int = 60*60) -> List[Time]:
+    """Return the end time of each slot, given the start times of all slots
+    in a day. Each slot ends when the next one starts, and the last slot is
+    'last_slot_length' seconds long (ending at 23:59:59 at the latest)."""
+    if not start_times:
+        return []
+    last_time = start_times[-1] + last_slot_length
+    last_time = last_time if last_time > start_times[-1] else Time(23,59,59) #preventing time overflow
+    return start_times[1:] + [last_time]
+
+def get_day_boundary_times(first_start_time: Time, last_end_time: Time):
+    """Return the (start_time, end_time) of the ZeroSlot added before the
+    first slot of a day and of the EODSlot added after the last slot. Either
+    one is None when the slots of the day already reach that end of the day."""
+    start_of_day, end_of_day = Time(0,0,0), Time(23,59,59)
+    zero_slot_times = (start_of_day, first_start_time) if first_start_time != start_of_day else None
+    eod_slot_times = (last_end_time, end_of_day) if last_end_time != end_of_day else None
+    return zero_slot_times, eod_slot_times
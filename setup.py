@@ -9,4 +9,12 @@ setup(
     author_email='prabhat.lankireddy@gmail.com',
     description='A link opener for the lazy student.',
     packages=find_packages(),
+    extras_require={
+        'columnar': ['numpy'],
+        'arrow': ['numpy', 'pyarrow'],
+        'parquet': ['numpy', 'pyarrow'],
+    },
+    entry_points={
+        'console_scripts': ['magik=magik.magik_cli:main'],
+    },
 )
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+import pytest
+from magik.userprofile import Profile
+
+
+@pytest.fixture
+def make_profile():
+    """Return a function that creates a default profile in given directory
+    and initializes it from its files."""
+    def make_profile(profile_dir):
+        p = Profile(profile_dir / 'config.ini', profile_dir / 'timetable.csv')
+        p.initialize_config_from_files()
+        return p
+    return make_profile
+
+
+@pytest.fixture
+def profile(make_profile, tmp_path):
+    """A default profile in tmp_path"""
+    return make_profile(tmp_path)
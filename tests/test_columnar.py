@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import pytest
+from magik.columnar import (
+    TimetableColumns,
+    export_store_timetables,
+    export_timetables,
+    get_profile_id_from_path,
+    load_timetable_columns,
+    slot_type_codes,
+)
+from magik.store import ProfileStore
+
+np = pytest.importorskip("numpy", reason="install requirements-test.txt to test columnar export")
+
+
+def get_slots_from_profile(profile_id, p):
+    """Slots of a profile as (profile, weekday, start, end, slot_type, category) tuples, built from Slot objects"""
+    slot_types = {"ZeroSlot": "zero", "EODSlot": "eod", "EmptySlot": "empty", "BreakSlot": "break", "ClassSlot": "class"}
+    weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    out = []
+    category_ids = {id(class_info): category_id for category_id, class_info in p.category_info.items()}
+    for day, dayschedule in p.timetable.items():
+        for slot in dayschedule.values():
+            category = category_ids[id(slot.class_info)] if hasattr(slot, 'class_info') else ''
+            out.append((profile_id, weekdays.index(day), slot.start_time.to_seconds(), slot.end_time.to_seconds(),
+                        slot_type_codes[slot_types[type(slot).__name__]], category))
+    return out
+
+
+def get_slots_from_array(slots):
+    return [(row['profile'].decode(), int(row['weekday']), int(row['start_seconds']), int(row['end_seconds']),
+             int(row['slot_type']), row['category'].decode()) for row in slots]
+
+
+def get_slots_from_table(table):
+    assert table.column_names == ['profile', 'weekday', 'start_seconds', 'end_seconds', 'slot_type', 'category']
+    return list(zip(*(table.column(name).to_pylist() for name in table.column_names)))
+
+
+class TestTimetableColumns:
+    def test_matches_dayschedules(self, profile):
+        columns = TimetableColumns()
+        columns.add_timetable_csv('alice', profile.timetable_file_path)
+        assert get_slots_from_array(columns.to_numpy()) == get_slots_from_profile('alice', profile)
+
+    def test_empty(self):
+        assert len(TimetableColumns().to_numpy()) == 0
+
+
+class TestExport:
+    def test_npy_round_trip(self, profile, tmp_path):
+        output_path = tmp_path / 'slots.npy'
+        number_of_slots = export_timetables([('alice', profile.timetable_file_path),
+                                             ('bob', profile.timetable_file_path)], output_path)
+        slots = load_timetable_columns(output_path)
+        assert isinstance(slots, np.memmap)
+        assert len(slots) == number_of_slots
+        assert get_slots_from_array(slots) == (get_slots_from_profile('alice', profile)
+                                               + get_slots_from_profile('bob', profile))
+
+    def test_store_export(self, profile, tmp_path):
+        with ProfileStore(tmp_path / 'profiles.db') as store:
+            store.import_profile('alice', profile.config_file_path, profile.timetable_file_path)
+            export_store_timetables(store, tmp_path / 'slots.npy')
+        slots = load_timetable_columns(tmp_path / 'slots.npy')
+        assert get_slots_from_array(slots) == get_slots_from_profile('alice', profile)
+
+    def test_arrow_round_trip(self, profile, tmp_path):
+        pa = pytest.importorskip("pyarrow", reason="install requirements-test.txt to test Arrow export")
+        output_path = tmp_path / 'slots.arrow'
+        export_timetables([('alice', profile.timetable_file_path),
+                           ('bob', profile.timetable_file_path)], output_path)
+        allocated_bytes = pa.total_allocated_bytes()
+        table = load_timetable_columns(output_path)
+        # The columns are memory-mapped, not copied into memory allocated by pyarrow
+        assert pa.total_allocated_bytes() == allocated_bytes
+        assert get_slots_from_table(table) == (get_slots_from_profile('alice', profile)
+                                               + get_slots_from_profile('bob', profile))
+
+    def test_parquet_round_trip(self, profile, tmp_path):
+        pytest.importorskip("pyarrow", reason="install requirements-test.txt to test Parquet export")
+        output_path = tmp_path / 'slots.parquet'
+        export_timetables([('alice', profile.timetable_file_path),
+                           ('bob', profile.timetable_file_path)], output_path)
+        table = load_timetable_columns(output_path)
+        assert get_slots_from_table(table) == (get_slots_from_profile('alice', profile)
+                                               + get_slots_from_profile('bob', profile))
+
+def test_get_profile_id_from_path(tmp_path):
+    assert get_profile_id_from_path(tmp_path / 'alice' / 'timetable.csv') == 'alice'
+    assert get_profile_id_from_path(tmp_path / 'bob.csv') == 'bob'
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from magik.linkcheck import LinkChecker, collect_links, get_default_cache_file, is_link
+from magik.structs import ClassInfo
+from magik.userprofile import Profile
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    request_counts = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.request_counts[("HEAD", self.path)] = self.request_counts.get(("HEAD", self.path), 0) + 1
+        if self.path == "/nohead":
+            self.respond(405)
+        elif self.path.startswith("/slow"):
+            time.sleep(1)
+            self.respond(200)
+        elif self.path.startswith("/ok"):
+            self.respond(200)
+        else:
+            self.respond(404)
+
+    def do_GET(self):
+        self.request_counts[("GET", self.path)] = self.request_counts.get(("GET", self.path), 0) + 1
+        if self.path in ("/nohead", "/ok"):
+            self.respond(200)
+        elif self.path.startswith("/slow"):
+            time.sleep(1)
+            self.respond(200)
+        else:
+            self.respond(404)
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_is_link():
+    assert is_link("https://duckduckgo.com")
+    assert not is_link("Mathematics")
+
+
+def test_collect_links_deduplicates():
+    profiles = []
+    for name in ("a.ini", "b.ini"):
+        p = Profile(config_file_path=name)
+        p.category_info = {"m": ClassInfo({"subject": "Mathematics",
+                                           "live_lecture_link": "https://wiki.archlinux.org",
+                                           "recorded_lecture_link": ""})}
+        profiles.append(p)
+    links = collect_links(profiles)
+    assert list(links) == ["https://wiki.archlinux.org"]
+    assert [usage.source for usage in links["https://wiki.archlinux.org"]] == ["a.ini", "b.ini"]
+
+
+class TestLinkChecker:
+    def test_ok(self, server_url):
+        with LinkChecker() as checker:
+            result = checker.check(server_url + "/ok")
+        assert result.ok and result.status == 200
+
+    def test_head_then_get_fallback(self, server_url):
+        with LinkChecker() as checker:
+            result = checker.check(server_url + "/nohead")
+        assert result.ok and result.status == 200
+        assert StandInHandler.request_counts[("HEAD", "/nohead")] >= 1
+
+    def test_broken(self, server_url):
+        with LinkChecker() as checker:
+            result = checker.check(server_url + "/missing")
+        assert not result.ok and result.status == 404
+
+    def test_timeout(self, server_url):
+        with LinkChecker(timeout=0.2) as checker:
+            started = time.monotonic()
+            result = checker.check(server_url + "/slow-timeout")
+            elapsed = time.monotonic() - started
+        assert not result.ok and result.status is None
+        # No GET request is made after the HEAD request timed out
+        assert elapsed < 0.4
+        assert ("GET", "/slow-timeout") not in StandInHandler.request_counts
+
+    def test_unreachable(self):
+        with LinkChecker(timeout=1) as checker:
+            result = checker.check("http://127.0.0.1:1/")
+        assert not result.ok
+
+    def test_cache(self, server_url):
+        url = server_url + "/ok-cached"
+        with LinkChecker(cache_ttl=60) as checker:
+            checker.check(url)
+            checker.check(url)
+        assert StandInHandler.request_counts[("HEAD", "/ok-cached")] == 1
+
+    def test_cache_expiry(self, server_url):
+        url = server_url + "/ok-expiring"
+        with LinkChecker(cache_ttl=0) as checker:
+            checker.check(url)
+            time.sleep(0.01)
+            checker.check(url)
+        assert StandInHandler.request_counts[("HEAD", "/ok-expiring")] == 2
+
+    def test_check_all(self, server_url):
+        urls = [f"{server_url}/ok-{idx}" for idx in range(200)] + [server_url + "/missing"]
+        with LinkChecker(max_workers=16) as checker:
+            results = checker.check_all(urls)
+        assert len(results) == 201
+        assert sum(not result.ok for result in results.values()) == 1
+
+    def test_cache_file(self, server_url, tmp_path):
+        cache_file = tmp_path / "magik" / "links.json"
+        urls = [server_url + "/ok-persisted", server_url + "/missing-persisted"]
+        for _ in range(2):
+            with LinkChecker(cache_ttl=60, cache_file=cache_file) as checker:
+                results = checker.check_all(urls)
+            assert [result.ok for result in results.values()] == [True, False]
+        # Only working links are kept between checkers
+        assert StandInHandler.request_counts[("HEAD", "/ok-persisted")] == 1
+        assert StandInHandler.request_counts[("HEAD", "/missing-persisted")] == 2
+
+    def test_cache_file_expiry(self, server_url, tmp_path):
+        cache_file = tmp_path / "links.json"
+        url = server_url + "/ok-persisted-expiring"
+        with LinkChecker(cache_ttl=60, cache_file=cache_file) as checker:
+            checker.check(url)
+        with LinkChecker(cache_ttl=0, cache_file=cache_file) as checker:
+            checker.check(url)
+        assert StandInHandler.request_counts[("HEAD", "/ok-persisted-expiring")] == 2
+
+    def test_invalid_cache_file(self, server_url, tmp_path):
+        cache_file = tmp_path / "links.json"
+        cache_file.write_text("{not json")
+        with LinkChecker(cache_file=cache_file) as checker:
+            assert checker.check(server_url + "/ok").ok
+        assert server_url + "/ok" in cache_file.read_text()
+
+
+def test_default_cache_file(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert get_default_cache_file() == tmp_path / "magik" / "links.json"
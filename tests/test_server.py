@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import webbrowser
+from pathlib import Path
+
+import pytest
+from magik.client import decode_request, encode_reply, encode_request, forward_command, get_socket_path
+from magik.server import create_server
+
+
+@pytest.fixture
+def profile_dir(profile):
+    return profile.config_file_path.parent
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths have to be short, so don't use tmp_path
+    socket_dir = tempfile.mkdtemp(prefix='magik-')
+    yield os.path.join(socket_dir, 'magik.sock')
+    shutil.rmtree(socket_dir)
+
+
+@pytest.fixture
+def server(socket_path):
+    server = create_server(socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def opened_links(monkeypatch):
+    links = []
+    monkeypatch.setattr(webbrowser, 'open', links.append)
+    return links
+
+
+def test_no_server(socket_path):
+    assert forward_command(['watch'], socket_path) is None
+
+
+def test_command_not_forwarded(server, socket_path):
+    assert forward_command(['check-links'], socket_path) is None
+    assert forward_command(['--no-server', 'watch'], socket_path) is None
+
+
+def test_invalid_arguments_not_handled(server, socket_path, monkeypatch, profile_dir):
+    monkeypatch.chdir(profile_dir)
+    assert forward_command(['open', 'm'], socket_path) is None
+
+
+def test_open_is_forwarded(server, socket_path, monkeypatch, profile_dir, opened_links):
+    monkeypatch.chdir(profile_dir)
+    assert forward_command(['open', 'm', 'live_lecture_link'], socket_path) == 0
+    assert opened_links == ['https://wiki.archlinux.org']
+    assert len(server.profiles) == 1
+
+
+def test_profile_is_reused_until_files_change(server, socket_path, monkeypatch, profile_dir, opened_links):
+    monkeypatch.chdir(profile_dir)
+    forward_command(['open', 'm', 'live_lecture_link'], socket_path)
+    (_, p), = server.profiles.values()
+    forward_command(['open', 'm', 'live_lecture_link'], socket_path)
+    assert next(iter(server.profiles.values()))[1] is p
+
+    config_file = Path(profile_dir / 'config.ini')
+    config_file.write_text(config_file.read_text().replace('https://wiki.archlinux.org', 'https://example.com'))
+    os.utime(config_file, ns=(0, 0))
+    forward_command(['open', 'm', 'live_lecture_link'], socket_path)
+    assert next(iter(server.profiles.values()))[1] is not p
+    assert opened_links[-1] == 'https://example.com'
+
+
+def test_output_is_forwarded(server, socket_path, monkeypatch, profile_dir, capsys):
+    monkeypatch.chdir(profile_dir)
+    assert forward_command(['open', 'x', 'live_lecture_link'], socket_path) == 0
+    assert "class or link type is invalid" in capsys.readouterr().out
+
+
+def test_reply_framing(server, socket_path, monkeypatch, profile_dir, capsys):
+    monkeypatch.setattr(server, 'run_command', lambda argv, cwd: encode_reply(3, "ü\nout\n", "err\n"))
+    monkeypatch.chdir(profile_dir)
+    assert forward_command(['open', 'm', 'live_lecture_link'], socket_path) == 3
+    assert capsys.readouterr() == ("ü\nout\n", "err\n")
+
+
+def test_request_framing():
+    assert decode_request(encode_request('/home/ü', ['open', 'm', ''])) == ('/home/ü', ['open', 'm', ''])
+
+
+def test_missing_store(server, socket_path, monkeypatch, profile_dir, capsys):
+    monkeypatch.chdir(profile_dir)
+    assert forward_command(['--store', 'missing.db', 'watch'], socket_path) == 1
+    err = capsys.readouterr().err
+    assert err.startswith("magik: Profile store ") and err.endswith("missing.db doesn't exist.\n")
+    assert not (profile_dir / 'missing.db').exists()
+
+
+def test_socket_of_other_user_is_ignored(server, socket_path, monkeypatch):
+    uid = os.getuid()
+    monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+    assert forward_command(['watch'], socket_path) is None
+
+
+def test_default_socket_in_private_dir(monkeypatch):
+    tmp_dir = tempfile.mkdtemp(prefix='magik-')
+    monkeypatch.setenv('TMPDIR', tmp_dir)
+    monkeypatch.delenv('MAGIK_SOCKET', raising=False)
+    monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+    try:
+        server = create_server()
+        server.server_close()
+        socket_dir = os.path.dirname(get_socket_path())
+        assert os.path.dirname(socket_dir) == tmp_dir
+        assert stat.S_IMODE(os.stat(socket_dir).st_mode) == 0o700
+
+        os.chmod(socket_dir, 0o777)
+        with pytest.raises(PermissionError):
+            create_server()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_server_already_running(server, socket_path):
+    with pytest.raises(FileExistsError):
+        create_server(socket_path)
+
+
+def test_profiles_stay_independent(server, socket_path, monkeypatch, tmp_path, opened_links, make_profile):
+    profile_dirs = {}
+    for name in ('a', 'b'):
+        profile_dir = profile_dirs[name] = tmp_path / name
+        profile_dir.mkdir()
+        make_profile(profile_dir)
+    config_file = profile_dirs['b'] / 'config.ini'
+    config_file.write_text(config_file.read_text().replace('openable_link_attribute = live_lecture_link',
+                                                           'openable_link_attribute = recorded_lecture_link'))
+
+    for name in ('a', 'b'):
+        monkeypatch.chdir(profile_dirs[name])
+        forward_command(['open', 'm', 'live_lecture_link'], socket_path)
+    pa = server.profiles[(profile_dirs['a'], None, None)][1]
+    pb = server.profiles[(profile_dirs['b'], None, None)][1]
+    assert pa.config is not pb.config
+    assert pa.config['openable_link_attribute'] == 'live_lecture_link'
+    assert pb.config['openable_link_attribute'] == 'recorded_lecture_link'
+
+
+def test_store_is_opened_once(server, socket_path, monkeypatch, profile_dir, opened_links):
+    from magik.store import ProfileStore
+    with ProfileStore(profile_dir / 'profiles.db') as store:
+        store.import_profile('alice', profile_dir / 'config.ini', profile_dir / 'timetable.csv')
+    monkeypatch.chdir(profile_dir)
+    forward_command(['--store', 'profiles.db', '--profile', 'alice', 'open', 'm', 'live_lecture_link'], socket_path)
+    store, = server.stores.values()
+
+    with ProfileStore(profile_dir / 'profiles.db') as other_store:
+        other_store.import_profile('alice', profile_dir / 'config.ini', profile_dir / 'timetable.csv')
+    os.utime(profile_dir / 'profiles.db', ns=(0, 0))
+    forward_command(['--store', 'profiles.db', '--profile', 'alice', 'open', 'm', 'live_lecture_link'], socket_path)
+    assert list(server.stores.values()) == [store]
+    assert opened_links == ['https://wiki.archlinux.org'] * 2
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import pytest
+from magik.structs import Time, ClassSlot, EODSlot
+from magik.store import ProfileStore, get_timestring_from_seconds
+from magik.userprofile import Profile
+
+
+@pytest.fixture
+def profile_files(profile):
+    return profile.config_file_path, profile.timetable_file_path
+
+
+@pytest.fixture
+def store(tmp_path, profile_files):
+    with ProfileStore(tmp_path / 'profiles.db') as store:
+        store.import_profile('alice', *profile_files)
+        store.import_profile('bob', *profile_files)
+        yield store
+
+
+def test_get_timestring_from_seconds():
+    assert get_timestring_from_seconds(9*3600 + 30*60) == "09:30"
+
+
+class TestProfileStore:
+    def test_get_profiles(self, store):
+        assert store.get_profiles() == ['alice', 'bob']
+
+    def test_round_trip(self, store, profile_files, tmp_path):
+        config_file_path, timetable_file_path = tmp_path / 'out.ini', tmp_path / 'out.csv'
+        store.export_profile('alice', config_file_path, timetable_file_path)
+        assert timetable_file_path.read_text() == profile_files[1].read_text()
+        assert config_file_path.read_text() == profile_files[0].read_text()
+
+    def test_export_does_not_overwrite(self, store, profile_files):
+        with pytest.raises(FileExistsError):
+            store.export_profile('alice', *profile_files)
+
+    def test_reimport_replaces_profile(self, store, profile_files):
+        store.import_profile('alice', *profile_files)
+        assert len(store.get_day_slots('alice', 'Monday')) == 6
+
+    def test_get_current_slot(self, store):
+        slot = store.get_current_slot('alice', 'Monday', Time(10,30,0))
+        assert (slot.start_seconds, slot.end_seconds, slot.slot_string) == (36000, 39600, 'cs')
+        assert store.get_current_slot('alice', 'Monday', Time(8,0,0)) is None
+        assert store.get_current_slot('alice', 'Monday', Time(15,0,0)) is None
+        assert store.get_current_slot('alice', 'Sunday', Time(10,0,0)) is None
+
+    def test_get_slots_at(self, store):
+        slots = store.get_slots_at('Tuesday', Time(11,15,0))
+        assert [(slot.profile, slot.slot_string) for slot in slots] == [('alice', 'cs'), ('bob', 'cs')]
+
+    def test_delete_profile(self, store):
+        store.delete_profile('bob')
+        assert store.get_profiles() == ['alice']
+        assert store.get_day_slots('bob', 'Monday') == []
+
+    def test_find_attribute_usages(self, store):
+        usages = store.find_attribute_usages('live_lecture_link', 'https://wiki.archlinux.org')
+        assert usages == [('alice', 'cs'), ('alice', 'm'), ('bob', 'cs'), ('bob', 'm')]
+
+
+class TestMissingStore:
+    def test_reads_dont_create_store(self, tmp_path):
+        store_path = tmp_path / 'missing.db'
+        with ProfileStore(store_path) as store:
+            with pytest.raises(FileNotFoundError, match="missing.db"):
+                store.get_profiles()
+            with pytest.raises(FileNotFoundError):
+                Profile().initialize_config_from_store(store, 'alice')
+        assert list(tmp_path.iterdir()) == []
+
+    def test_failed_import_doesnt_create_store(self, tmp_path):
+        with ProfileStore(tmp_path / 'profiles.db') as store:
+            with pytest.raises(FileNotFoundError):
+                store.import_profile('alice', tmp_path / 'config.ini', tmp_path / 'timetable.csv')
+        assert list(tmp_path.iterdir()) == []
+
+    def test_import_creates_store(self, tmp_path, profile_files):
+        with ProfileStore(tmp_path / 'new.db') as store:
+            store.import_profile('alice', *profile_files)
+        with ProfileStore(tmp_path / 'new.db') as store:
+            assert store.get_profiles() == ['alice']
+
+
+class TestProfileFromStore:
+    def test_initialize_config_from_store(self, store, profile_files):
+        p = Profile()
+        p.initialize_config_from_store(store, 'alice')
+        from_files = Profile(*profile_files)
+        from_files.initialize_config_from_files()
+        assert p.config == from_files.config
+        assert p.category_info == from_files.category_info
+        assert list(p.timetable) == list(from_files.timetable)
+        assert not p.timetable.is_built('Monday')
+        dayschedule = p.timetable['Monday']
+        assert isinstance(dayschedule[Time(9,0,0)], ClassSlot)
+        assert isinstance(dayschedule[Time(15,0,0)], EODSlot)
+        assert list(dayschedule) == list(from_files.timetable['Monday'])
+
+    def test_missing_profile(self, store):
+        with pytest.raises(KeyError):
+            Profile().initialize_config_from_store(store, 'carol')
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import pytest
+from magik.structs import Time, DaySchedule, ClassSlot, ZeroSlot, EODSlot
+
+
+class TestLazyTimeTable:
+    def test_days_listed_without_building(self, profile):
+        assert list(profile.timetable) == ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+        assert not any(profile.timetable.is_built(day) for day in profile.timetable)
+
+    def test_only_accessed_day_is_built(self, profile):
+        dayschedule = profile.timetable['Monday']
+        assert isinstance(dayschedule, DaySchedule)
+        assert profile.timetable.is_built('Monday')
+        assert not profile.timetable.is_built('Tuesday')
+
+    def test_dayschedule_is_memoized(self, profile):
+        assert profile.timetable['Monday'] is profile.timetable['Monday']
+
+    def test_dayschedule_contents(self, profile):
+        dayschedule = profile.timetable['Monday']
+        assert isinstance(dayschedule[Time(0,0,0)], ZeroSlot)
+        assert isinstance(dayschedule[Time(9,0,0)], ClassSlot)
+        assert isinstance(dayschedule[Time(15,0,0)], EODSlot)
+        assert dayschedule[Time(9,0,0)].next_slot is dayschedule[Time(10,0,0)]
+
+    def test_missing_day(self, profile):
+        assert 'Sunday' not in profile.timetable
+        with pytest.raises(KeyError):
+            profile.timetable['Sunday']
+
+    def test_unknown_category(self, profile):
+        timetable_file = profile.timetable_file_path
+        timetable_file.write_text(timetable_file.read_text().replace('Monday,m,', 'Monday,xx,'))
+        profile.initialize_config_from_files()
+        assert 'Monday' in profile.timetable
+        with pytest.raises(ValueError, match="'xx'.*Monday"):
+            profile.timetable['Monday']
+        with pytest.raises(ValueError):
+            profile.timetable.get('Monday')
+        assert isinstance(profile.timetable['Tuesday'], DaySchedule)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import configparser
+import csv
+
+import pytest
+from magik.utils import (
+    generate_config_file,
+    generate_config_file_stream,
+    generate_profile_stream,
+    get_day_boundary_times,
+    get_ids_from_category_names,
+    get_slot_end_times,
+)
+from magik.defaults import default_first_section_heading, default_general_config, default_subjects_info
+from magik.structs import Time
+from magik.userprofile import Profile
+
+
+class TestCategoryIds:
+    def test_initials(self):
+        assert get_ids_from_category_names(["Mathematics", "Computer Science"]) == ["m", "cs"]
+
+    def test_collisions(self):
+        names = ["Mathematics", "Mechanics", "Music", "Computer Science", "Cognitive Science"]
+        assert get_ids_from_category_names(names) == ["m", "m-2", "m-3", "cs", "cs-2"]
+
+    def test_collision_with_suffixed_id(self):
+        assert get_ids_from_category_names(["Maths", "m - 2", "Music", "Mechanics"]) == ["m", "m-2", "m-3", "m-4"]
+
+    def test_many_collisions(self):
+        ids = get_ids_from_category_names(["Mathematics"] * 50000)
+        assert len(set(ids)) == 50000
+        assert ids[-1] == "m-50000"
+
+
+def test_get_slot_end_times():
+    assert get_slot_end_times([Time(9,0,0), Time(10,30,0)]) == [Time(10,30,0), Time(11,30,0)]
+    assert get_slot_end_times([Time(22,0,0), Time(23,30,0)]) == [Time(23,30,0), Time(23,59,59)]
+    assert get_slot_end_times([]) == []
+
+
+
+def test_get_day_boundary_times():
+    assert get_day_boundary_times(Time(9,0,0), Time(15,0,0)) == ((Time(0,0,0), Time(9,0,0)), (Time(15,0,0), Time(23,59,59)))
+    assert get_day_boundary_times(Time(0,0,0), Time(23,59,59)) == (None, None)
+
+
+class TestGenerateConfigFileStream:
+    def test_same_as_generate_config_file(self, tmp_path):
+        category_list = ["Mathematics", "Computer Science", "Music"]
+        generate_config_file(tmp_path / 'a.ini', default_first_section_heading, default_general_config,
+                             category_list, default_subjects_info)
+        generate_config_file_stream(tmp_path / 'b.ini', default_first_section_heading, default_general_config,
+                                    iter(category_list), default_subjects_info)
+        assert (tmp_path / 'a.ini').read_text() == (tmp_path / 'b.ini').read_text()
+
+    def test_does_not_overwrite(self, tmp_path):
+        (tmp_path / 'a.ini').write_text("")
+        with pytest.raises(FileExistsError):
+            generate_config_file_stream(tmp_path / 'a.ini', default_first_section_heading, default_general_config,
+                                        ["Mathematics"], default_subjects_info)
+
+    def test_percent_signs_are_escaped(self, tmp_path):
+        generate_config_file_stream(tmp_path / 'a.ini', default_first_section_heading, default_general_config,
+                                    ["100% Done"], {"live_lecture_link": "https://example.com/a%20b"})
+        config = configparser.ConfigParser()
+        config.read(tmp_path / 'a.ini')
+        assert config["Subjects"]["1d"] == "100% Done"
+        assert config["100% Done"]["live_lecture_link"] == "https://example.com/a%20b"
+
+
+class TestGenerateProfileStream:
+    def test_generated_profile_loads(self, tmp_path):
+        config_file_path, timetable_file_path = tmp_path / 'config.ini', tmp_path / 'timetable.csv'
+        courses = (f"Course N{idx}\n" for idx in range(1000))
+        number_of_courses = generate_profile_stream(config_file_path, timetable_file_path,
+                                                    default_first_section_heading, dict(default_general_config),
+                                                    courses, {"live_lecture_link": "https://example.com/{id}"},
+                                                    ["Monday", "Tuesday"], ["09:00", "10:00"])
+        assert number_of_courses == 1000
+
+        config = configparser.ConfigParser()
+        config.read(config_file_path)
+        assert config["Course N999"]["live_lecture_link"] == "https://example.com/cn-1000"
+        with open(timetable_file_path, newline='') as csvfile:
+            rows = list(csv.reader(csvfile))
+        assert rows == [["Day", "09:00", "10:00"], ["Monday", "cn", "cn-2"], ["Tuesday", "cn-3", "cn-4"]]
+
+        p = Profile(config_file_path, timetable_file_path)
+        p.initialize_config_from_files()
+        assert len(p.category_info) == 1000
+        assert p.timetable['Monday'] is not None